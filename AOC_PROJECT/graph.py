@@ -1,25 +1,284 @@
+from __future__ import annotations
+
+from array import array
+from typing import Hashable, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+
+NodeId = Hashable
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; works on scalars or NumPy arrays"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = np.radians(lon2) - np.radians(lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def alt_h(u_idx, v_idx, landmark_dist):
+    """ALT lower bound on the travel time between u and v:
+    max over landmarks L of |d(L, u) - d(L, v)|, by the triangle inequality.
+    u_idx may be an index array to bound many nodes against one v at once."""
+    if len(landmark_dist) == 0:
+        return np.zeros(np.shape(u_idx))
+    to_u = landmark_dist[:, u_idx].astype(np.float64)
+    to_v = landmark_dist[:, v_idx].astype(np.float64)
+    if to_u.ndim == 2:
+        to_v = to_v[:, None]
+    # A landmark that reaches neither node says nothing (inf - inf)
+    with np.errstate(invalid='ignore'):
+        diff = np.abs(to_u - to_v)
+        if landmark_dist.dtype == np.float32:
+            # Take back the float32 rounding of the stored distances so the
+            # bound can never overestimate
+            slack = np.spacing(np.maximum(to_u, to_v).astype(np.float32))
+            diff -= np.where(np.isfinite(slack), slack, 0)
+    diff[np.isnan(diff)] = 0
+    return np.maximum(diff.max(axis=0), 0)
+
 class SimpleGraph:
-    def __init__(self):
-        self.adjacency = {}
-        self.positions = {}
-        self.grid = [[[] for _ in range(10)] for _ in range(10)]
-    
-    def add_node(self, node_id, lat, lon):
-        self.adjacency[node_id] = []
-        self.positions[node_id] = (lat, lon)
-        grid_x = int((lat - 0.3) * 20)
-        grid_y = int((lon - 32.5) * 20)
-        if 0 <= grid_x < 10 and 0 <= grid_y < 10:
-            self.grid[grid_x][grid_y].append(node_id)
-    
-    def add_edge(self, from_node, to_node, travel_time):
-        if from_node not in self.adjacency:
-            self.adjacency[from_node] = []
-        if to_node not in self.adjacency:
-            self.adjacency[to_node] = []
-        
-        self.adjacency[from_node].append((to_node, travel_time))
-        self.adjacency[to_node].append((from_node, travel_time))
-    
-    def get_neighbors(self, node_id):
-        return self.adjacency.get(node_id, [])
\ No newline at end of file
+    __slots__ = ('_id_of', '_id_from', 'adjacency', '_lat', '_lon', 'finalized',
+                 'indptr', 'indices', 'weights', 'positions_arr', 'lats', 'lons',
+                 'time_per_km', 'int_weights', 'kdtree', '_kd_index', 'csgraph',
+                 'landmarks', 'landmark_dist', 'version')
+    
+    def __init__(self) -> None:
+        # Node ids are interned to ints 0..N-1 in insertion order; those
+        # ints index every internal structure, including the CSR arrays
+        self._id_of: dict[NodeId, int] = {}
+        self._id_from: list[NodeId] = []
+        # Per int id: (neighbour ints, travel times) as packed C arrays,
+        # which take a few bytes per road instead of a tuple object each
+        self.adjacency: list[tuple[array, array]] = []
+        self._lat = array('d')
+        self._lon = array('d')
+        self.finalized: bool = False
+        # Bumped by every edit, so caches of search results can tell when
+        # they are stale
+        self.version: int = 0
+    
+    @property
+    def node_index(self) -> dict[NodeId, int]:
+        """node_id -> int index into the CSR and position arrays"""
+        return self._id_of
+    
+    @property
+    def node_ids(self) -> list[NodeId]:
+        """int index -> node_id"""
+        return self._id_from
+    
+    def _intern(self, node_id: NodeId) -> int:
+        i = self._id_of.get(node_id)
+        if i is None:
+            i = len(self._id_from)
+            self._id_of[node_id] = i
+            self._id_from.append(node_id)
+            self.adjacency.append((array('i'), array('f')))
+            self._lat.append(np.nan)
+            self._lon.append(np.nan)
+        return i
+    
+    def add_node(self, node_id: NodeId, lat: float, lon: float) -> None:
+        i = self._intern(node_id)
+        self.adjacency[i] = (array('i'), array('f'))
+        self._lat[i] = lat
+        self._lon[i] = lon
+        self.finalized = False
+        self.version += 1
+    
+    def add_edge(self, from_node: NodeId, to_node: NodeId, travel_time: float) -> None:
+        u = self._intern(from_node)
+        v = self._intern(to_node)
+        
+        neighbors, times = self.adjacency[u]
+        neighbors.append(v)
+        times.append(travel_time)
+        neighbors, times = self.adjacency[v]
+        neighbors.append(u)
+        times.append(travel_time)
+        self.finalized = False
+        self.version += 1
+    
+    def add_edges_bulk(self, src, dst, travel_times) -> None:
+        """Add many two-way roads at once from parallel arrays of node ids
+        and travel times. Ids are interned once per distinct node and each
+        node's arrays are extended once, instead of once per road."""
+        src = np.asarray(src)
+        dst = np.asarray(dst)
+        travel_times = np.asarray(travel_times, np.float32)
+        if len(src) == 0:
+            return
+        
+        distinct, inverse = np.unique(np.concatenate([src, dst]), return_inverse=True)
+        interned = np.array([self._intern(node_id) for node_id in distinct.tolist()], np.intc)
+        u, v = np.split(interned[inverse], 2)
+        
+        # Both directions of every road, grouped by the node they leave from
+        heads = np.concatenate([u, v])
+        tails = np.concatenate([v, u])
+        times = np.concatenate([travel_times, travel_times])
+        order = np.argsort(heads, kind='stable')
+        heads, tails, times = heads[order], tails[order], times[order]
+        bounds = np.flatnonzero(np.diff(heads)) + 1
+        
+        for lo, hi in zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(heads)].tolist()):
+            neighbors, node_times = self.adjacency[heads[lo]]
+            neighbors.frombytes(tails[lo:hi].tobytes())
+            node_times.frombytes(times[lo:hi].tobytes())
+        self.finalized = False
+        self.version += 1
+    
+    def build_csr(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The adjacency lists packed into new CSR arrays (indptr, indices,
+        weights): structure of arrays, one contiguous run per node.
+        
+        Neighbours of node index i are indices[indptr[i]:indptr[i+1]] with
+        the matching travel times in weights."""
+        n = len(self._id_from)
+        indptr = np.zeros(n + 1, np.int32)
+        np.cumsum([len(neighbors) for neighbors, _ in self.adjacency], out=indptr[1:])
+        
+        # The per-node C arrays are copied straight into the CSR arrays
+        indices = np.concatenate([np.empty(0, np.int32)] +
+                                 [np.frombuffer(neighbors, np.intc)
+                                  for neighbors, _ in self.adjacency]).astype(np.int32)
+        weights = np.concatenate([np.empty(0, np.float32)] +
+                                 [np.frombuffer(times, np.float32)
+                                  for _, times in self.adjacency])
+        # float32 halves the bytes read per relaxation; city trips are far
+        # below its range, so anything that overflowed is a bad input
+        if not np.isfinite(weights).all():
+            raise ValueError("travel times must be finite and fit in float32")
+        return indptr, indices, weights
+    
+    def finalize(self, num_landmarks: int = 16) -> None:
+        """Build the CSR arrays (build_csr) and everything the searches
+        precompute from them. Call again after editing the graph;
+        ShortestPath does so itself before searching an edited graph."""
+        n = len(self._id_from)
+        self.indptr, self.indices, self.weights = self.build_csr()
+        
+        # Whole-number travel times let A* use a bucket queue instead of a heap
+        self.int_weights = bool(np.all(self.weights == np.round(self.weights))
+                                and np.all(self.weights >= 0))
+        # and, when they fit, be stored as uint16: half the bytes per
+        # relaxation again, and the pure-Python searches add exact ints
+        if self.int_weights and (len(self.weights) == 0
+                                 or self.weights.max() <= np.iinfo(np.uint16).max):
+            self.weights = self.weights.astype(np.uint16)
+        
+        # Positions by node index (NaN where a node was never placed)
+        self.positions_arr = np.empty((n, 2))
+        self.positions_arr[:, 0] = np.frombuffer(self._lat, np.float64)
+        self.positions_arr[:, 1] = np.frombuffer(self._lon, np.float64)
+        placed = ~np.isnan(self.positions_arr[:, 0])
+        self.lats = np.where(placed, self.positions_arr[:, 0], 0.0)
+        self.lons = np.where(placed, self.positions_arr[:, 1], 0.0)
+        self.time_per_km = self._fastest_time_per_km() if placed.all() else 0.0
+        
+        # Spatial index over every placed node (lat, lon in degrees)
+        self._kd_index = np.flatnonzero(placed)
+        self.kdtree = cKDTree(self.positions_arr[placed]) if placed.any() else None
+        
+        self.csgraph = self._to_csgraph()
+        self.landmarks, self.landmark_dist = self._pick_landmarks(num_landmarks)
+        
+        # Nothing writes these after this point (editing the graph means
+        # finalizing again into new arrays). Read-only also keeps their
+        # pages shared between forked server workers.
+        for arr in (self.indptr, self.indices, self.weights, self.positions_arr,
+                    self.lats, self.lons, self.landmarks, self.landmark_dist):
+            arr.flags.writeable = False
+        self.finalized = True
+    
+    def _to_csgraph(self) -> csr_matrix:
+        """The CSR arrays as a scipy matrix for scipy.sparse.csgraph routines.
+        scipy adds up duplicate entries, so parallel roads are first reduced
+        to the fastest one."""
+        n = len(self.node_ids)
+        rows = np.repeat(np.arange(n), np.diff(self.indptr))
+        order = np.lexsort((self.weights, self.indices, rows))
+        rows, cols, weights = rows[order], self.indices[order], self.weights[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        return csr_matrix((weights[first], (rows[first], cols[first])), shape=(n, n))
+    
+    def _pick_landmarks(self, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Farthest-point sampling: start at node index 0, then keep adding
+        the node farthest (by travel time) from all landmarks so far.
+        Returns the landmark indices and their (k, N) float32 distance table."""
+        n = len(self.node_ids)
+        k = min(k, n)
+        landmarks = []
+        landmark_dist = np.empty((k, n))
+        closest = np.full(n, np.inf)
+        candidate = 0
+        for row in range(k):
+            landmarks.append(candidate)
+            landmark_dist[row] = dijkstra(self.csgraph, directed=True, indices=candidate)
+            closest = np.minimum(closest, landmark_dist[row])
+            closest[landmarks] = -1  # never pick a landmark twice
+            candidate = int(np.argmax(closest))  # inf first: covers other components
+        # float32 like the edge weights, at half the memory of float64
+        return np.array(landmarks, np.int32), landmark_dist.astype(np.float32)
+    
+    def _fastest_time_per_km(self) -> float:
+        """Lowest travel time per km over all roads, so that
+        time_per_km * straight-line distance never overestimates a trip"""
+        if len(self.indices) == 0:
+            return 0.0
+        rows = np.repeat(np.arange(len(self.node_ids)), np.diff(self.indptr))
+        lengths = haversine_km(self.lats[rows], self.lons[rows],
+                               self.lats[self.indices], self.lons[self.indices])
+        moving = lengths > 0
+        if not moving.any():
+            return 0.0
+        # Shave a hair off so float rounding can't make the bound inadmissible
+        return float((self.weights[moving] / lengths[moving]).min()) * (1 - 1e-9)
+    
+    def nearest(self, lat: float, lon: float) -> Optional[NodeId]:
+        """Id of the node closest to (lat, lon), or None for an empty graph"""
+        if not self.finalized:
+            self.finalize()
+        if self.kdtree is None:
+            return None
+        _, i = self.kdtree.query((lat, lon))
+        return self._id_from[self._kd_index[i]]
+    
+    def within(self, lat: float, lon: float, r: float) -> np.ndarray:
+        """Ids of the nodes within r degrees of (lat, lon)"""
+        if not self.finalized:
+            self.finalize()
+        if self.kdtree is None:
+            return np.array([])
+        hits = self.kdtree.query_ball_point((lat, lon), r)
+        return np.array([self._id_from[self._kd_index[i]] for i in sorted(hits)])
+    
+    def to_csr(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(indptr, indices, weights), finalizing first if the graph changed"""
+        if not self.finalized:
+            self.finalize()
+        return self.indptr, self.indices, self.weights
+    
+    def neighbors_csr(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.weights[start:end]
+    
+    def get_neighbors(self, node_id: NodeId) -> list[tuple[NodeId, float]]:
+        """(neighbour id, travel time) pairs of a node, for callers outside
+        the searches (which read the CSR arrays directly)"""
+        i = self._id_of.get(node_id)
+        if i is None:
+            return []
+        if self.finalized:
+            indices, weights = self.neighbors_csr(i)
+            indices, weights = indices.tolist(), weights.tolist()
+        else:
+            indices, weights = self.adjacency[i]
+        node_ids = self._id_from
+        return [(node_ids[j], w) for j, w in zip(indices, weights)]
\ No newline at end of file
@@ -0,0 +1,17 @@
+"""
+Gunicorn settings: one Uvicorn worker process per core
+Run with: gunicorn -c gunicorn_conf.py main:app
+"""
+import multiprocessing
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = multiprocessing.cpu_count() * 2 + 1
+bind = "0.0.0.0:8000"
+
+# Import main (and build the graph) once in the master before forking,
+# so workers share its read-only pages copy-on-write
+preload_app = True
+
+# Gunicorn already runs a worker per core, so each worker needs only a
+# small search pool of its own
+raw_env = ["ROUTE_POOL_SIZE=1"]
\ No newline at end of file
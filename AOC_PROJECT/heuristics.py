@@ -1,34 +1,129 @@
+from __future__ import annotations
+
 import random
+from functools import cached_property, lru_cache
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from graph import NodeId, SimpleGraph
+from shortest_path import ShortestPath
 
 class MultiStopRouter:
-    def __init__(self, graph):
+    def __init__(self, graph: SimpleGraph, sp: ShortestPath | None = None) -> None:
         self.graph = graph
-        from shortest_path import ShortestPath
-        self.sp = ShortestPath(graph)
+        # Optional, for callers that pass one in to keep alongside; tours
+        # come from _stop_table's one scipy call and never search through it
+        self.sp = sp
+        self._tour_version = graph.version
+    
+    def invalidate(self) -> None:
+        """Forget cached tours (greedy_tsp also does so itself once the
+        graph has been edited)"""
+        self._tour_cache.cache_clear()
+    
+    @cached_property
+    def _tour_cache(self):
+        # Per instance, so each router's tours live and die with its graph
+        return lru_cache(maxsize=1024)(self._greedy_tsp_impl)
     
-    def greedy_tsp(self, stops):
+    def _stop_table(self, nodes: list[NodeId]) -> np.ndarray:
+        """Travel times between every pair of `nodes` as a len(nodes) square
+        matrix, from one native scipy Dijkstra call over the CSR graph"""
+        if not self.graph.finalized:
+            self.graph.finalize()
+        
+        idx = [self.graph.node_index[n] for n in nodes]
+        # The matrix already holds both directions of every road
+        return dijkstra(self.graph.csgraph, directed=True, indices=idx)[:, idx]
+    
+    def greedy_tsp(self, stops: list[NodeId], seeds: int = 3) -> tuple[list[NodeId], float]:
         if len(stops) < 2:
             return stops, 0
         
-        unvisited = set(stops[1:])  # Keep first as starting point
-        current = stops[0]
-        route = [current]
-        total_time = 0
+        if self._tour_version != self.graph.version:
+            # The graph was edited, so every cached tour may be wrong
+            self._tour_cache.cache_clear()
+            self._tour_version = self.graph.version
         
-        while unvisited:
-            nearest = None
-            min_time = float('inf')
-            
-            for stop in unvisited:
-                _, time = self.sp.a_star(current, stop)
-                if time < min_time:
-                    min_time = time
-                    nearest = stop
+        # The tour only depends on the start and the set of other stops, so
+        # the same pickups requested in any order share one cache entry
+        route, total_time = self._tour_cache(stops[0], frozenset(stops[1:]), seeds)
+        return list(route), total_time
+    
+    def _greedy_tsp_impl(self, start: NodeId, others: frozenset,
+                         seeds: int) -> tuple[tuple[NodeId, ...], float]:
+        # Keep first as starting point; other stops are visited once each
+        nodes = [start] + list(others)
+        table = self._stop_table(nodes)
+        
+        # Plain nearest-neighbour gets stuck with its first choice, so also
+        # try the next-closest first hops and keep the best polished tour
+        best_route, best_time = [nodes[0]], 0
+        for first in np.argsort(table[0, 1:])[:seeds] + 1:
+            if not np.isfinite(table[0, first]):
+                break
+            order = self._nearest_neighbour(table, int(first))
+            order, total_time = self._two_opt_order(table, order)
+            route = [nodes[i] for i in order]
+            if len(route) > len(best_route) or (len(route) == len(best_route)
+                                                and total_time < best_time):
+                best_route, best_time = route, total_time
+        
+        return tuple(best_route), best_time
+    
+    def _nearest_neighbour(self, table: np.ndarray, first: int) -> list[int]:
+        """Greedy tour over table positions from 0, forcing `first` as the first hop"""
+        # Visited columns are set to inf, so each step is a single argmin
+        # over the current row with no Python-level scan
+        remaining = table.copy()
+        remaining[:, [0, first]] = np.inf
+        current = first
+        order = [0, first]
+        
+        for _ in range(len(table) - 2):
+            nearest = int(np.argmin(remaining[current]))
+            if remaining[current, nearest] == np.inf:  # remaining stops are unreachable
+                break
             
-            if nearest:
-                route.append(nearest)
-                total_time += min_time
-                unvisited.remove(nearest)
-                current = nearest
+            order.append(nearest)
+            remaining[:, nearest] = np.inf
+            current = nearest
+        
+        return order
+    
+    def two_opt(self, route: list[NodeId],
+                max_sweeps: int = 10) -> tuple[list[NodeId], float]:
+        """Improve an open tour (first stop fixed, no return leg) by reversing
+        segments while that shortens it. Returns (route, total_time)."""
+        route = list(route)
+        order, total_time = self._two_opt_order(self._stop_table(route),
+                                                list(range(len(route))), max_sweeps)
+        return [route[i] for i in order], total_time
+    
+    def _two_opt_order(self, table, order, max_sweeps=10):
+        """two_opt over positions in a _stop_table matrix, so each swap
+        is checked with four table lookups"""
+        order = list(order)
+        t = table.tolist()  # nested lists index faster than a NumPy scalar
+        n = len(order)
+        
+        for _ in range(max_sweeps):
+            improved = False
+            for i in range(1, n - 1):
+                for j in range(i + 1, n):
+                    # Reversing order[i..j] swaps edges (a, b) and (c, d)
+                    # for (a, c) and (b, d)
+                    a, b, c = order[i - 1], order[i], order[j]
+                    delta = t[a][c] - t[a][b]
+                    if j + 1 < n:
+                        d = order[j + 1]
+                        delta += t[b][d] - t[c][d]
+                    if delta < -1e-9:
+                        order[i:j + 1] = order[i:j + 1][::-1]
+                        improved = True
+            if not improved:
+                break
         
-        return route, total_time
\ No newline at end of file
+        total_time = sum(t[a][b] for a, b in zip(order, order[1:]))
+        return order, total_time
\ No newline at end of file
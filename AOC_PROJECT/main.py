@@ -1,18 +1,31 @@
 """
 Kampala Transport System - Web Interface
 Run with: uvicorn main:app --reload
+Production: gunicorn -c gunicorn_conf.py main:app
 Open browser: http://localhost:8000
 
 Main file to demonstrate the system
 """
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import json
+import asyncio
+import gc
+import gzip
+import hashlib
 import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from typing import Optional
 
+import anyio
+import numpy as np
+import orjson
+from pydantic import BaseModel, Field
+
 # Import our modules
 from graph import SimpleGraph
 from shortest_path import ShortestPath
@@ -22,6 +35,23 @@ from heuristics import MultiStopRouter
 
 # Setup templates
 templates = Jinja2Templates(directory="templates")
+# The page has no per-request variables, so it is rendered (and
+# compressed) once instead of going through Jinja on every request
+INDEX_HTML = templates.get_template("index.html").render().encode("utf-8")
+INDEX_HTML_GZ = gzip.compress(INDEX_HTML, 9)
+
+# Upper bounds on request sizes; bigger inputs are refused before any
+# parsing or searching, so a single request can't tie up a worker
+MAX_BODY_BYTES = 16 * 1024
+MAX_STOPS = 32
+MAX_BATCH = 256
+
+# JSON request bodies, parsed and validated in one pass by pydantic
+class MultiStopBody(BaseModel):
+    stops: list[int] = Field(max_length=MAX_STOPS)  # [start, stop1, stop2, ..., end]
+
+class BatchBody(BaseModel):
+    requests: list[tuple[int, int]] = Field(max_length=MAX_BATCH)  # [[start1, end1], [start2, end2], ...]
 
 # Creating Kampala graph (mock data for demo)
 def create_kampala_graph():
@@ -70,20 +100,104 @@ def create_kampala_graph():
         (1, 14, 7),  # Garden City -> Kabalagala
     ]
     
-    for from_node, to_node, time in roads:
-        graph.add_edge(from_node, to_node, time)
+    from_nodes, to_nodes, times = zip(*roads)
+    graph.add_edges_bulk(from_nodes, to_nodes, times)
+    graph.finalize()
     
     return graph, locations
 
 # Create global instances
 graph, locations = create_kampala_graph()
+# Node id -> name, and the (name, coords) pairs, built once instead of per request
+LOCATION_NAMES = tuple(locations.keys())
+LOCATION_ITEMS = tuple(locations.items())
+# Object array of names, so a whole path maps to names in one C-level gather
+NAMES_NP = np.array(LOCATION_NAMES, dtype=object)
 sp = ShortestPath(graph)
+# The roads are fixed at startup, so compile searches specialized to them
+sp.specialize()
 ch = CongestionHandler(graph)
-pp = ParallelProcessor(num_workers=4)
+pp = ParallelProcessor(graph, num_workers=4, sp=sp)
+# Before the route pool forks, so its workers' batches all read one copy
+pp.share()
 msr = MultiStopRouter(graph)
 
+# Searches run in worker processes, forked after the graph is built so
+# they share it copy-on-write. With numba a single route is microseconds,
+# but multi-stop tours and batches still take long enough to stall the
+# event loop, and without numba every search is pure Python that holds
+# the GIL. The jobs are top-level functions so they pickle.
+# The pool is made in lifespan, i.e. once per server process: a pool
+# created before gunicorn forks its workers would share one task queue
+ROUTE_POOL_SIZE = int(os.environ.get("ROUTE_POOL_SIZE", os.cpu_count()))
+executor = None
+
+def route_job(algorithm, start, end):
+    if algorithm == "dijkstra":
+        return sp.dijkstra(start, end)
+    return sp.a_star(start, end)  # A* by default
+
+def multi_stop_job(stops):
+    return msr.greedy_tsp(stops)
+
+def batch_job(requests):
+    return pp.simple_parallel(requests)
+
+async def run_in_pool(job, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, job, *args)
+
+# The graph never changes, so a (start, end, algorithm) route is always
+# the same; recent ones are answered here without a trip to the pool
+ROUTE_CACHE_SIZE = 1024
+_route_cache = OrderedDict()
+
+async def cached_route(algorithm, start, end):
+    """(path tuple, time) for a route, by LRU cache or the process pool"""
+    algorithm = "dijkstra" if algorithm == "dijkstra" else "astar"
+    key = (start, end, algorithm)
+    hit = _route_cache.get(key)
+    if hit is not None:
+        _route_cache.move_to_end(key)
+        return hit
+    
+    path, time = await run_in_pool(route_job, algorithm, start, end)
+    hit = _route_cache[key] = (tuple(path), time)
+    if len(_route_cache) > ROUTE_CACHE_SIZE:
+        _route_cache.popitem(last=False)
+    return hit
+
+@asynccontextmanager
+async def lifespan(app):
+    # Plain def handlers run on anyio's threadpool; the default of 40
+    # threads is the cap on how many of them run at once
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 64
+    global executor
+    executor = ProcessPoolExecutor(max_workers=ROUTE_POOL_SIZE)
+    yield
+    executor.shutdown(cancel_futures=True)
+    pp.close()
+
 # Create FastAPI app (was missing, caused NameError)
-app = FastAPI(title="KAMPALA INTELLIGENT MULTI-MODAL TRANSPORT SYSTEM", version="1.0")
+# orjson encodes the path/name lists of batch responses much faster than json
+app = FastAPI(title="KAMPALA INTELLIGENT MULTI-MODAL TRANSPORT SYSTEM", version="1.0",
+              default_response_class=ORJSONResponse, lifespan=lifespan)
+# Compress dynamic responses; the precompressed ones below already carry
+# a Content-Encoding header, which the middleware leaves alone
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=6)
+
+@app.middleware("http")
+async def limit_body_size(request: Request, call_next):
+    length = request.headers.get("content-length")
+    if length is None and request.method in ("POST", "PUT", "PATCH"):
+        # A chunked body has no length to check up front, and would
+        # otherwise be read and parsed in full before any limit applies
+        return ORJSONResponse({"success": False, "error": "Content-Length required"},
+                              status_code=411)
+    if length is not None and length.isdigit() and int(length) > MAX_BODY_BYTES:
+        return ORJSONResponse({"success": False, "error": "Request body too large"},
+                              status_code=413)
+    return await call_next(request)
+
 # Optionally mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -91,14 +205,29 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Home page"""
-    return templates.TemplateResponse("index.html", {"request": request})
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return HTMLResponse(INDEX_HTML_GZ, headers=headers)
+    return HTMLResponse(INDEX_HTML, headers=headers)
+
+def _cached_json(request: Request, body: bytes, body_gz: bytes, etag: str):
+    """Serve a pre-encoded JSON body (gzipped if the client accepts it),
+    or 304 if the client already has it"""
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = body_gz
+        etag = etag[:-1] + '-gzip"'  # each encoding is its own representation
+        headers["Content-Encoding"] = "gzip"
+    headers["ETag"] = etag
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 @app.get("/api/locations")
-async def get_locations():
+async def get_locations(request: Request):
     """Get list of locations in Kampala"""
-    location_list = [{"id": i, "name": name, "lat": lat, "lon": lon}
-                     for i, (name, (lat, lon)) in enumerate(locations.items())]
-    return {"locations": location_list}
+    return _cached_json(request, LOCATIONS_JSON, LOCATIONS_JSON_GZ, LOCATIONS_ETAG)
 
 @app.post("/api/route")
 async def calculate_route(
@@ -111,13 +240,11 @@ async def calculate_route(
         start = int(start)
         end = int(end)
 
-        if algorithm =="dijkstra":
-            path, time = sp.dijkstra(start, end)
-        else: # A* by default
-            path, time = sp.a_star(start, end)
+        path, time = await cached_route(algorithm, start, end)
+        path = list(path)
 
         # Convert path to location names
-        path_names = [list(locations.keys())[node_id] for node_id in path]
+        path_names = NAMES_NP[path].tolist()
 
         return {
             "success": True,
@@ -131,18 +258,15 @@ async def calculate_route(
         return {"success": False, "error": str(e)}
     
 @app.post("/api/multi_stop")
-async def multi_stop_route(stops: str = Form(...)):
+async def multi_stop_route(body: MultiStopBody):
     """Calculate multi-stop route using simulated annealing"""
     try:
-        stops_list = json.loads(stops) # [start, stop1, stop2, ..., end]
-
-        # Convert to node IDs
-        stop_ids = [int(s) for s in stops_list]
+        stops_list = body.stops
 
         # Using greedy algorithm
-        route, time = msr.greedy_tsp(stops_list)
+        route, time = await run_in_pool(multi_stop_job, stops_list)
 
-        route_names = [list(locations.keys())[node_id] for node_id in route]
+        route_names = NAMES_NP[route].tolist()
 
         return {
             "success": True,
@@ -155,7 +279,7 @@ async def multi_stop_route(stops: str = Form(...)):
         return {"success": False, "error": str(e)}
     
 @app.get("/api/congestion/{road_id}")
-async def get_congestion(road_id: str):
+def get_congestion(road_id: str):
     """Get congestion alternatives for a road"""
     try:
         start, end = map(int, road_id.split("-"))
@@ -163,7 +287,7 @@ async def get_congestion(road_id: str):
         
         result = []
         for alt in alternatives:
-            alt_path_names = [list(locations.keys())[node_id] for node_id in alt['path']]
+            alt_path_names = NAMES_NP[alt['path']].tolist()
             result.append({
                 "path": alt['path'],
                 "path_names": alt_path_names,
@@ -176,17 +300,20 @@ async def get_congestion(road_id: str):
         return {"success": False, "error": str(e)}
 
 @app.post("/api/batch-routes")
-async def batch_routes(requests: str = Form(...)):
+async def batch_routes(body: BatchBody):
     """Process multiple routes in parallel"""
     try:
-        requests_list = json.loads(requests)  # [[start1, end1], [start2, end2], ...]
+        requests_list = body.requests
         
         # Process in parallel
-        results = pp.simple_parallel(graph, requests_list)
+        # Duplicate (start, end) pairs are searched once
+        unique = list(dict.fromkeys(requests_list))
+        solved = dict(zip(unique, await run_in_pool(batch_job, unique)))
+        results = [solved[pair] for pair in requests_list]
         
         response = []
         for i, (path, time) in enumerate(results):
-            path_names = [list(locations.keys())[node_id] for node_id in path]
+            path_names = NAMES_NP[path].tolist()
             response.append({
                 "request_id": i,
                 "path": path,
@@ -199,763 +326,41 @@ async def batch_routes(requests: str = Form(...)):
         return {"success": False, "error": str(e)}
 
 @app.get("/api/graph-data")
-async def get_graph_data():
+async def get_graph_data(request: Request):
     """Get graph data for visualization"""
-    nodes = []
-    for i, (name, (lat, lon)) in enumerate(locations.items()):
-        nodes.append({
-            "id": i,
-            "name": name,
-            "lat": lat,
-            "lon": lon,
-            "x": (lon - 32.56) * 1000,  # Scale for visualization
-            "y": (lat - 0.30) * 1000
-        })
+    return _cached_json(request, GRAPH_JSON, GRAPH_JSON_GZ, GRAPH_ETAG)
+
+def build_locations_data():
+    location_list = [{"id": i, "name": name, "lat": lat, "lon": lon}
+                     for i, (name, (lat, lon)) in enumerate(LOCATION_ITEMS)]
+    return {"locations": location_list}
+
+def build_graph_data():
+    # Scale for visualization, for every node at once
+    xs = ((graph.lons - 32.56) * 1000).tolist()
+    ys = ((graph.lats - 0.30) * 1000).tolist()
+    nodes = [{"id": i, "name": name, "lat": lat, "lon": lon, "x": x, "y": y}
+             for i, ((name, (lat, lon)), x, y) in enumerate(zip(LOCATION_ITEMS, xs, ys))]
     
-    edges = []
-    for i in range(len(locations)):
-        for neighbor, weight in graph.get_neighbors(i):
-            edges.append({
-                "from": i,
-                "to": neighbor,
-                "weight": weight
-            })
+    # Walk the CSR arrays directly: edge k leaves node rows[k]
+    indptr, indices, weights = graph.to_csr()
+    node_ids = graph.node_ids
+    rows = np.repeat(np.arange(len(node_ids)), np.diff(indptr))
+    edges = [{"from": node_ids[u], "to": node_ids[v], "weight": weight}
+             for u, v, weight in zip(rows.tolist(), indices.tolist(), weights.tolist())]
     
     return {"nodes": nodes, "edges": edges}
 
-# Create templates directory if it doesn't exist
-os.makedirs("templates", exist_ok=True)
-
-# Create HTML template
-with open("templates/index.html", "w", encoding="utf-8") as f:
-    f.write("""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Kampala Transport System</title>
-    <script src="https://cdn.plot.ly/plotly-2.24.1.min.js"></script>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            color: #333;
-        }
-        
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-        
-        header {
-            text-align: center;
-            margin-bottom: 30px;
-            color: white;
-        }
-        
-        h1 {
-            font-size: 2.5rem;
-            margin-bottom: 10px;
-        }
-        
-        .subtitle {
-            font-size: 1.2rem;
-            opacity: 0.9;
-        }
-        
-        .main-content {
-            display: grid;
-            grid-template-columns: 300px 1fr;
-            gap: 20px;
-        }
-        
-        .sidebar {
-            background: white;
-            border-radius: 15px;
-            padding: 25px;
-            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-        }
-        
-        .graph-container {
-            background: white;
-            border-radius: 15px;
-            padding: 20px;
-            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-            height: 600px;
-        }
-        
-        .form-group {
-            margin-bottom: 20px;
-        }
-        
-        label {
-            display: block;
-            margin-bottom: 8px;
-            font-weight: 600;
-            color: #555;
-        }
-        
-        select, input, button {
-            width: 100%;
-            padding: 12px;
-            border: 2px solid #e1e5e9;
-            border-radius: 10px;
-            font-size: 16px;
-            transition: all 0.3s;
-        }
-        
-        select:focus, input:focus {
-            outline: none;
-            border-color: #667eea;
-            box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-        }
-        
-        button {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            cursor: pointer;
-            font-weight: 600;
-            letter-spacing: 1px;
-            margin-top: 5px;
-        }
-        
-        button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 10px 20px rgba(0,0,0,0.2);
-        }
-        
-        .results {
-            background: #f8f9fa;
-            border-radius: 10px;
-            padding: 20px;
-            margin-top: 20px;
-            max-height: 300px;
-            overflow-y: auto;
-        }
-        
-        .result-item {
-            background: white;
-            border-radius: 8px;
-            padding: 15px;
-            margin-bottom: 10px;
-            border-left: 4px solid #667eea;
-        }
-        
-        .route-path {
-            font-family: monospace;
-            background: #f1f3f4;
-            padding: 8px;
-            border-radius: 5px;
-            margin: 10px 0;
-            font-size: 14px;
-        }
-        
-        .time-badge {
-            background: #667eea;
-            color: white;
-            padding: 4px 12px;
-            border-radius: 20px;
-            font-size: 14px;
-            display: inline-block;
-            margin-top: 5px;
-        }
-        
-        .controls {
-            display: flex;
-            gap: 10px;
-            margin-bottom: 20px;
-        }
-        
-        .control-btn {
-            flex: 1;
-            padding: 10px;
-            background: #f8f9fa;
-            border: 2px solid #e1e5e9;
-            border-radius: 10px;
-            cursor: pointer;
-            text-align: center;
-            transition: all 0.3s;
-        }
-        
-        .control-btn.active {
-            background: #667eea;
-            color: white;
-            border-color: #667eea;
-        }
-        
-        @media (max-width: 768px) {
-            .main-content {
-                grid-template-columns: 1fr;
-            }
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <header>
-            <h1>🚗 KAMPALA INTELLIGENT MULTI-MODAL TRANSPORT SYSTEM</h1>
-            <p class="subtitle">Intelligent Multi-Modal Route Optimization</p>
-        </header>
-        
-        <div class="main-content">
-            <div class="sidebar">
-                <div class="controls">
-                    <div class="control-btn active" onclick="showTab('route')">Route</div>
-                    <div class="control-btn" onclick="showTab('multi')">Multi-Stop</div>
-                    <div class="control-btn" onclick="showTab('congestion')">Congestion</div>
-                    <div class="control-btn" onclick="showTab('batch')">Batch</div>
-                </div>
-                
-                <!-- Route Tab -->
-                <div id="route-tab" class="tab-content">
-                    <h3>Find Shortest Route</h3>
-                    <div class="form-group">
-                        <label for="start">Start Location</label>
-                        <select id="start">
-                            <option value="">Select start location...</option>
-                        </select>
-                    </div>
-                    
-                    <div class="form-group">
-                        <label for="end">Destination</label>
-                        <select id="end">
-                            <option value="">Select destination...</option>
-                        </select>
-                    </div>
-                    
-                    <div class="form-group">
-                        <label for="algorithm">Algorithm</label>
-                        <select id="algorithm">
-                            <option value="astar">A* Search (Fastest)</option>
-                            <option value="dijkstra">Dijkstra (Guaranteed)</option>
-                        </select>
-                    </div>
-                    
-                    <button onclick="calculateRoute()">Find Route</button>
-                </div>
-                
-                <!-- Multi-Stop Tab -->
-                <div id="multi-tab" class="tab-content" style="display: none;">
-                    <h3>Multi-Stop Route</h3>
-                    <div class="form-group">
-                        <label>Select Stops (in order):</label>
-                        <div id="multi-stops">
-                            <select class="stop-select" onchange="updateMultiRoute()">
-                                <option value="">Select stop...</option>
-                            </select>
-                        </div>
-                        <button onclick="addStop()" style="margin-top: 10px;">+ Add Stop</button>
-                    </div>
-                    <button onclick="calculateMultiRoute()">Calculate Multi-Stop Route</button>
-                </div>
-                
-                <!-- Congestion Tab -->
-                <div id="congestion-tab" class="tab-content" style="display: none;">
-                    <h3>Congestion Management</h3>
-                    <div class="form-group">
-                        <label for="congested-road">Select Congested Road</label>
-                        <select id="congested-road">
-                            <option value="">Select road...</option>
-                        </select>
-                    </div>
-                    <button onclick="checkCongestion()">Find Alternatives</button>
-                </div>
-                
-                <!-- Batch Tab -->
-                <div id="batch-tab" class="tab-content" style="display: none;">
-                    <h3>Batch Route Processing</h3>
-                    <p>Process multiple routes in parallel</p>
-                    <div id="batch-requests">
-                        <div class="batch-request">
-                            <select class="batch-start">
-                                <option value="">Start...</option>
-                            </select>
-                            <select class="batch-end">
-                                <option value="">End...</option>
-                            </select>
-                        </div>
-                    </div>
-                    <button onclick="addBatchRequest()" style="margin: 10px 0;">+ Add Request</button>
-                    <button onclick="processBatch()">Process Batch</button>
-                </div>
-                
-                <!-- Results -->
-                <div id="results" class="results">
-                    <h4>Results will appear here</h4>
-                    <p>Select a function and click calculate</p>
-                </div>
-            </div>
-            
-            <div class="graph-container">
-                <div id="graph"></div>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        let locations = [];
-        let currentRoute = [];
-        let currentMode = 'route';
-        
-        // Initialize
-        document.addEventListener('DOMContentLoaded', async function() {
-            await loadLocations();
-            initializeGraph();
-            showTab('route');
-        });
-        
-        async function loadLocations() {
-            try {
-                const response = await fetch('/api/locations');
-                const data = await response.json();
-                locations = data.locations;
-                
-                // Populate dropdowns
-                const selectElements = document.querySelectorAll('select:not(.stop-select):not(.batch-start):not(.batch-end)');
-                selectElements.forEach(select => {
-                    // Clear existing options except first
-                    while (select.options.length > 1) {
-                        select.remove(1);
-                    }
-                    
-                    // Add locations
-                    locations.forEach(loc => {
-                        const option = document.createElement('option');
-                        option.value = loc.id;
-                        option.textContent = loc.name;
-                        select.appendChild(option);
-                    });
-                });
-                
-                // Also populate specialized dropdowns
-                populateSpecialDropdowns();
-                
-            } catch (error) {
-                console.error('Error loading locations:', error);
-            }
-        }
-        
-        function populateSpecialDropdowns() {
-            // Roads for congestion tab
-            const roads = [
-                "0-1", "0-2", "2-1", "0-3", "3-4",
-                "2-5", "5-6", "1-7", "7-8", "1-9"
-            ];
-            
-            const roadSelect = document.getElementById('congested-road');
-            roads.forEach(road => {
-                const [start, end] = road.split('-');
-                const startName = locations.find(l => l.id == start)?.name || start;
-                const endName = locations.find(l => l.id == end)?.name || end;
-                const option = document.createElement('option');
-                option.value = road;
-                option.textContent = `${startName} → ${endName}`;
-                roadSelect.appendChild(option);
-            });
-        }
-        
-        function showTab(tabName) {
-            // Update controls
-            document.querySelectorAll('.control-btn').forEach(btn => {
-                btn.classList.remove('active');
-            });
-            event.target.classList.add('active');
-            
-            // Show selected tab
-            document.querySelectorAll('.tab-content').forEach(tab => {
-                tab.style.display = 'none';
-            });
-            document.getElementById(`${tabName}-tab`).style.display = 'block';
-            
-            currentMode = tabName;
-        }
-        
-        async function calculateRoute() {
-            const start = document.getElementById('start').value;
-            const end = document.getElementById('end').value;
-            const algorithm = document.getElementById('algorithm').value;
-            
-            if (!start || !end) {
-                showError('Please select both start and end locations');
-                return;
-            }
-            
-            const formData = new FormData();
-            formData.append('start', start);
-            formData.append('end', end);
-            formData.append('algorithm', algorithm);
-            
-            try {
-                const response = await fetch('/api/route', {
-                    method: 'POST',
-                    body: formData
-                });
-                
-                const result = await response.json();
-                
-                if (result.success) {
-                    displayRouteResult(result);
-                    currentRoute = result.path;
-                    updateGraph(result.path);
-                } else {
-                    showError(result.error);
-                }
-            } catch (error) {
-                showError('Error calculating route: ' + error.message);
-            }
-        }
-        
-        async function calculateMultiRoute() {
-            const stopSelects = document.querySelectorAll('.stop-select');
-            const stops = Array.from(stopSelects)
-                .map(select => select.value)
-                .filter(value => value !== '');
-            
-            if (stops.length < 2) {
-                showError('Please select at least 2 stops');
-                return;
-            }
-            
-            const formData = new FormData();
-            formData.append('stops', JSON.stringify(stops));
-            
-            try {
-                const response = await fetch('/api/multi-stop', {
-                    method: 'POST',
-                    body: formData
-                });
-                
-                const result = await response.json();
-                
-                if (result.success) {
-                    displayMultiRouteResult(result);
-                    currentRoute = result.route;
-                    updateGraph(result.route);
-                } else {
-                    showError(result.error);
-                }
-            } catch (error) {
-                showError('Error calculating multi-stop route: ' + error.message);
-            }
-        }
-        
-        async function checkCongestion() {
-            const road = document.getElementById('congested-road').value;
-            
-            if (!road) {
-                showError('Please select a road');
-                return;
-            }
-            
-            try {
-                const response = await fetch(`/api/congestion/${road}`);
-                const result = await response.json();
-                
-                if (result.success) {
-                    displayCongestionResult(result);
-                } else {
-                    showError(result.error);
-                }
-            } catch (error) {
-                showError('Error checking congestion: ' + error.message);
-            }
-        }
-        
-        async function processBatch() {
-            const batchDivs = document.querySelectorAll('.batch-request');
-            const requests = [];
-            
-            batchDivs.forEach(div => {
-                const start = div.querySelector('.batch-start').value;
-                const end = div.querySelector('.batch-end').value;
-                
-                if (start && end) {
-                    requests.push([parseInt(start), parseInt(end)]);
-                }
-            });
-            
-            if (requests.length === 0) {
-                showError('Please add at least one valid request');
-                return;
-            }
-            
-            const formData = new FormData();
-            formData.append('requests', JSON.stringify(requests));
-            
-            try {
-                const response = await fetch('/api/batch-routes', {
-                    method: 'POST',
-                    body: formData
-                });
-                
-                const result = await response.json();
-                
-                if (result.success) {
-                    displayBatchResult(result);
-                } else {
-                    showError(result.error);
-                }
-            } catch (error) {
-                showError('Error processing batch: ' + error.message);
-            }
-        }
-        
-        function displayRouteResult(result) {
-            const resultsDiv = document.getElementById('results');
-            resultsDiv.innerHTML = `
-                <h4>Route Found!</h4>
-                <div class="result-item">
-                    <strong>Path:</strong>
-                    <div class="route-path">${result.path_names.join(' → ')}</div>
-                    <div class="time-badge">${result.time} minutes</div>
-                    <div><small>Algorithm: ${result.algorithm.toUpperCase()}</small></div>
-                    <div><small>Distance: ${result.distance} road segments</small></div>
-                </div>
-            `;
-        }
-        
-        function displayMultiRouteResult(result) {
-            const resultsDiv = document.getElementById('results');
-            resultsDiv.innerHTML = `
-                <h4>Multi-Stop Route Found!</h4>
-                <div class="result-item">
-                    <strong>Optimal Route:</strong>
-                    <div class="route-path">${result.route_names.join(' → ')}</div>
-                    <div class="time-badge">${result.time} minutes total</div>
-                    <div><small>Stops: ${result.stops} locations</small></div>
-                </div>
-            `;
-        }
-        
-        function displayCongestionResult(result) {
-            const resultsDiv = document.getElementById('results');
-            let html = `<h4>Alternative Routes Found</h4>`;
-            
-            result.alternatives.forEach((alt, index) => {
-                html += `
-                    <div class="result-item">
-                        <strong>Alternative ${index + 1}:</strong>
-                        <div class="route-path">${alt.path_names.join(' → ')}</div>
-                        <div class="time-badge">${alt.time} minutes</div>
-                        <div><small>Capacity: ${alt.capacity} vehicles/hour</small></div>
-                    </div>
-                `;
-            });
-            
-            resultsDiv.innerHTML = html;
-        }
-        
-        function displayBatchResult(result) {
-            const resultsDiv = document.getElementById('results');
-            let html = `<h4>Batch Processing Complete</h4>`;
-            
-            result.results.forEach((res, index) => {
-                html += `
-                    <div class="result-item">
-                        <strong>Request ${index + 1}:</strong>
-                        <div class="route-path">${res.path_names.join(' → ')}</div>
-                        <div class="time-badge">${res.time} minutes</div>
-                    </div>
-                `;
-            });
-            
-            html += `<p><small>Processed ${result.results.length} routes in parallel</small></p>`;
-            resultsDiv.innerHTML = html;
-        }
-        
-        function showError(message) {
-            const resultsDiv = document.getElementById('results');
-            resultsDiv.innerHTML = `
-                <div style="color: #e74c3c; background: #ffeaea; padding: 15px; border-radius: 8px; border-left: 4px solid #e74c3c;">
-                    <strong>Error:</strong> ${message}
-                </div>
-            `;
-        }
-        
-        function addStop() {
-            const stopsDiv = document.getElementById('multi-stops');
-            const select = document.createElement('select');
-            select.className = 'stop-select';
-            select.onchange = updateMultiRoute;
-            
-            const defaultOption = document.createElement('option');
-            defaultOption.value = '';
-            defaultOption.textContent = 'Select stop...';
-            select.appendChild(defaultOption);
-            
-            locations.forEach(loc => {
-                const option = document.createElement('option');
-                option.value = loc.id;
-                option.textContent = loc.name;
-                select.appendChild(option);
-            });
-            
-            stopsDiv.appendChild(select);
-        }
-        
-        function addBatchRequest() {
-            const batchDiv = document.getElementById('batch-requests');
-            const requestDiv = document.createElement('div');
-            requestDiv.className = 'batch-request';
-            requestDiv.style.display = 'flex';
-            requestDiv.style.gap = '10px';
-            requestDiv.style.marginBottom = '10px';
-            
-            const startSelect = document.createElement('select');
-            startSelect.className = 'batch-start';
-            
-            const endSelect = document.createElement('select');
-            endSelect.className = 'batch-end';
-            
-            // Add default options
-            [startSelect, endSelect].forEach(select => {
-                const defaultOption = document.createElement('option');
-                defaultOption.value = '';
-                defaultOption.textContent = select.className.includes('start') ? 'Start...' : 'End...';
-                select.appendChild(defaultOption);
-                
-                locations.forEach(loc => {
-                    const option = document.createElement('option');
-                    option.value = loc.id;
-                    option.textContent = loc.name;
-                    select.appendChild(option);
-                });
-            });
-            
-            requestDiv.appendChild(startSelect);
-            requestDiv.appendChild(endSelect);
-            batchDiv.appendChild(requestDiv);
-        }
-        
-        function updateMultiRoute() {
-            // This could show a preview of selected stops
-        }
-        
-        // Graph visualization
-        function initializeGraph() {
-            fetch('/api/graph-data')
-                .then(response => response.json())
-                .then(data => {
-                    drawGraph(data);
-                });
-        }
-        
-        function drawGraph(graphData) {
-            const traceNodes = {
-                x: graphData.nodes.map(node => node.x),
-                y: graphData.nodes.map(node => node.y),
-                mode: 'markers+text',
-                type: 'scatter',
-                text: graphData.nodes.map(node => node.name),
-                textposition: 'top center',
-                marker: {
-                    size: 12,
-                    color: '#667eea',
-                    line: {
-                        width: 2,
-                        color: '#ffffff'
-                    }
-                },
-                name: 'Locations',
-                hoverinfo: 'text'
-            };
-            
-            // Create edge traces
-            const edgeTraces = graphData.edges.map(edge => {
-                const fromNode = graphData.nodes.find(n => n.id == edge.from);
-                const toNode = graphData.nodes.find(n => n.id == edge.to);
-                
-                return {
-                    x: [fromNode.x, toNode.x, null],
-                    y: [fromNode.y, toNode.y, null],
-                    mode: 'lines',
-                    type: 'scatter',
-                    line: {
-                        width: 2,
-                        color: '#ccc'
-                    },
-                    hoverinfo: 'none',
-                    showlegend: false
-                };
-            });
-            
-            const layout = {
-                title: 'Kampala Road Network',
-                showlegend: false,
-                hovermode: 'closest',
-                margin: { t: 30, b: 20, l: 20, r: 20 },
-                xaxis: {
-                    showgrid: false,
-                    zeroline: false,
-                    showticklabels: false
-                },
-                yaxis: {
-                    showgrid: false,
-                    zeroline: false,
-                    showticklabels: false
-                },
-                plot_bgcolor: '#f8f9fa',
-                paper_bgcolor: '#f8f9fa'
-            };
-            
-            Plotly.newPlot('graph', [traceNodes, ...edgeTraces], layout);
-        }
-        
-        function updateGraph(route) {
-            if (!route || route.length < 2) return;
-            
-            fetch('/api/graph-data')
-                .then(response => response.json())
-                .then(data => {
-                    // Create highlighted route trace
-                    const routeX = [];
-                    const routeY = [];
-                    
-                    route.forEach(nodeId => {
-                        const node = data.nodes.find(n => n.id == nodeId);
-                        if (node) {
-                            routeX.push(node.x);
-                            routeY.push(node.y);
-                        }
-                    });
-                    
-                    const routeTrace = {
-                        x: routeX,
-                        y: routeY,
-                        mode: 'lines+markers',
-                        type: 'scatter',
-                        line: {
-                            width: 4,
-                            color: '#00b894'
-                        },
-                        marker: {
-                            size: 10,
-                            color: '#00b894'
-                        },
-                        name: 'Selected Route',
-                        hoverinfo: 'none'
-                    };
-                    
-                    // Redraw graph with highlighted route
-                    drawGraph(data);
-                    
-                    // Add route trace
-                    Plotly.addTraces('graph', routeTrace);
-                });
-        }
-    </script>
-</body>
-</html>
-    """)
+# The graph is built once and never changes, so these responses are
+# encoded a single time and served from memory
+LOCATIONS_JSON = orjson.dumps(build_locations_data())
+LOCATIONS_JSON_GZ = gzip.compress(LOCATIONS_JSON, 9)
+LOCATIONS_ETAG = '"%s"' % hashlib.sha1(LOCATIONS_JSON).hexdigest()
+GRAPH_JSON = orjson.dumps(build_graph_data())
+GRAPH_JSON_GZ = gzip.compress(GRAPH_JSON, 9)
+GRAPH_ETAG = '"%s"' % hashlib.sha1(GRAPH_JSON).hexdigest()
 
-print("HTML template created successfully!")
\ No newline at end of file
+# Everything above is built once and only read afterwards. Moving it out
+# of the GC's reach stops collections in forked workers from writing to
+# (and so copying) the pages they share with the preloading master.
+gc.freeze()
\ No newline at end of file
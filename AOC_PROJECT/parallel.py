@@ -1,19 +1,193 @@
 import concurrent.futures
+import copy
+import os
+from collections import defaultdict
+from multiprocessing import shared_memory, util
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from shortest_path import ShortestPath, astar_csr
+
+# Graph arrays the worker processes search, handed over in shared memory
+# blocks instead of being pickled into each worker
+SHARED_ARRAYS = ('indptr', 'indices', 'weights', 'lats', 'lons', 'landmark_dist')
+
+# Each worker process builds its own ShortestPath once, in _init_worker, and
+# reuses it for every request it is handed
+_sp = None
+_blocks = []  # the shared arrays are only valid while their blocks are open
+
+def _share_graph(graph):
+    """(stub, specs, blocks) for a finalized graph: a copy without the
+    SHARED_ARRAYS (and scipy matrix) to pickle, a (attr, block name, shape,
+    dtype) spec per array, and the shared memory blocks holding them"""
+    arrays = {name: getattr(graph, name) for name in SHARED_ARRAYS}
+    csgraph = graph.csgraph
+    arrays.update(csgraph_data=csgraph.data, csgraph_indices=csgraph.indices,
+                  csgraph_indptr=csgraph.indptr)
+    
+    stub = copy.copy(graph)
+    for name in SHARED_ARRAYS:
+        setattr(stub, name, None)
+    stub.csgraph = None
+    stub.adjacency = []  # workers only search; they never edit or finalize
+    
+    specs, blocks = [], []
+    for name, arr in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, arr.dtype, buffer=block.buf)[...] = arr
+        blocks.append(block)
+        specs.append((name, block.name, arr.shape, arr.dtype.str))
+    return stub, specs, blocks
+
+def _release(blocks, owner):
+    """Close the blocks, and unlink them if this is the process that made
+    them (forked children inherit them, and this finalizer, too)"""
+    for block in blocks:
+        block.close()
+        if os.getpid() == owner:
+            block.unlink()
+
+def _init_worker(graph, specs=()):
+    global _sp
+    views = {}
+    for name, block_name, shape, dtype in specs:
+        # Attaching registers the block with the parent's resource tracker,
+        # which workers share; the parent unlinks it when done
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        view = np.ndarray(shape, dtype, buffer=block.buf)
+        view.flags.writeable = False
+        views[name] = view
+    if specs:
+        for name in SHARED_ARRAYS:
+            setattr(graph, name, views[name])
+        n = len(graph.node_ids)
+        graph.csgraph = csr_matrix((views['csgraph_data'], views['csgraph_indices'],
+                                    views['csgraph_indptr']), shape=(n, n))
+    _sp = ShortestPath(graph)
+
+def _solve_group(sp, start, ends):
+    """(path, time) for start to each of ends"""
+    # One full Dijkstra pays off once a source repeats; a single request
+    # is cheaper as one goal-directed search
+    if len(ends) > 1:
+        return sp.paths_from(start, ends)
+    return [sp.a_star(start, ends[0])]
+
+def _process_group(group):
+    return _solve_group(_sp, *group)
 
 class ParallelProcessor:
-    def __init__(self, num_workers=2):
+    def __init__(self, graph, num_workers=2, sp=None):
+        self.graph = graph
         self.num_workers = num_workers
+        # One ShortestPath for every batch, so its route and heuristic
+        # caches carry over; share an existing one if given
+        self.sp = sp or ShortestPath(graph)
+        # CSR arrays and landmark tables are built here, at start-up,
+        # rather than by the first request (the numba kernels are compiled
+        # when shortest_path is imported)
+        if not graph.finalized:
+            graph.finalize()
+        # (graph.indptr it was made for, stub, specs) for the process pool
+        self._shared = None
+        # (pid, graph.indptr) it was made for, and the pool itself
+        self._pool = None
+    
+    def share(self):
+        """Put the graph in shared memory now rather than on the first
+        process-pool batch. Processes forked afterwards (a server's
+        worker pool) then all reuse the one copy, which stays until
+        close() or exit in this process. A no-op when the numba searches
+        run on threads."""
+        if astar_csr is None:
+            if not self.graph.finalized:
+                self.graph.finalize()
+            self._shared_graph()
     
-    def simple_parallel(self, graph, requests):
-        from shortest_path import ShortestPath
-        sp = ShortestPath(graph)
+    def close(self):
+        """Shut down the process pool and release the shared memory; a
+        later batch starts them again"""
+        if self._pool is not None:
+            if self._pool[0][0] == os.getpid():  # not a forked parent's pool
+                self._pool_shutdown()
+            self._pool = None
+        if self._shared is not None:
+            self._shared_release()
+            self._shared = None
+    
+    def _shared_graph(self):
+        """Pool initargs: the graph's shared memory copy, made once per
+        finalize and released by close() or when the processor goes away"""
+        graph = self.graph
+        if self._shared is None or self._shared[0] is not graph.indptr:
+            if self._shared is not None:
+                self._shared_release()
+            stub, specs, blocks = _share_graph(graph)
+            self._shared_release = util.Finalize(self, _release, args=(blocks, os.getpid()),
+                                                 exitpriority=0)
+            self._shared = (graph.indptr, stub, specs)
+        return self._shared[1:]
+    
+    def _process_pool(self):
+        """Worker processes for the pure-Python path, started on first use
+        and kept for later batches. A new pool is started once the graph
+        has been finalized again (its workers hold the old arrays), or in
+        a forked child, which can't use its parent's pool."""
+        key = (os.getpid(), self.graph.indptr)
+        if self._pool is not None:
+            (pid, indptr), executor = self._pool
+            if pid == key[0] and indptr is key[1]:
+                return executor
+            if pid == key[0]:
+                self._pool_shutdown()
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.num_workers,
+                                                          initializer=_init_worker,
+                                                          initargs=self._shared_graph())
+        # multiprocessing's finalizers also run when a pool worker
+        # process exits (atexit hooks don't), so the pool of a
+        # ParallelProcessor used inside one is shut down with it. This
+        # must run before the queues' own exit finalizers (priority 10)
+        # stop the feeder threads that would send the workers' stop
+        # sentinels.
+        self._pool_shutdown = util.Finalize(self, executor.shutdown, exitpriority=20)
+        self._pool = (key, executor)
+        return executor
+    
+    def simple_parallel(self, requests):
+        graph = self.graph
+        # The graph may have been edited since the last batch
+        if not graph.finalized:
+            graph.finalize()
         
-        def process_request(req):
-            start, end = req
-            return sp.a_star(start, end)
+        # Requests sharing a source are answered from one search
+        by_src = defaultdict(list)
+        for k, (start, _) in enumerate(requests):
+            by_src[start].append(k)
+        groups = [(start, [requests[k][1] for k in ks]) for start, ks in by_src.items()]
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers) as executor:
-            futures = [executor.submit(process_request, req) for req in requests]
-            results = [f.result() for f in futures]
+        # The numba search releases the GIL, so threads run it truly in
+        # parallel, all reading the one copy of the CSR arrays with no
+        # pickling or worker start-up
+        if astar_csr is not None:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                answers = list(executor.map(self._answer_group, groups))
+        else:
+            # The pure-Python searches hold the GIL, so threads would take
+            # turns; separate processes run them on separate cores. Workers
+            # map the graph's arrays from shared memory, so only a small
+            # stub of it is pickled to each.
+            chunksize = max(1, len(groups) // (4 * self.num_workers))
+            answers = list(self._process_pool().map(_process_group, groups,
+                                                    chunksize=chunksize))
         
-        return results
\ No newline at end of file
+        results = [None] * len(requests)
+        for ks, group_answers in zip(by_src.values(), answers):
+            for k, answer in zip(ks, group_answers):
+                results[k] = answer
+        return results
+    
+    def _answer_group(self, group):
+        return _solve_group(self.sp, *group)
\ No newline at end of file
@@ -1,70 +1,633 @@
 import heapq
+import threading
+from collections import OrderedDict, defaultdict
+from functools import cached_property, lru_cache, wraps
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+
+from graph import alt_h, haversine_km
+
+try:
+    from _astar_nb import (astar_csr, dial_csr, dijkstra_all_csr, dijkstra_csr,
+                           fixed_topology, gc_dist_many, reconstruct_path)
+except ImportError:  # numba not installed, use the pure-Python search
+    astar_csr = dial_csr = dijkstra_all_csr = dijkstra_csr = None
+    fixed_topology = gc_dist_many = reconstruct_path = None
+
+# Mean degree from which the pure-Python searches relax a node's edges in
+# one NumPy expression; below it the per-call overhead outweighs the loop
+VECTOR_MIN_DEGREE = 64
+
+class LFUCache:
+    """Fixed-size mapping that evicts the least frequently used key (the
+    least recently used of those on a tie), with O(1) get and put. Safe
+    to share between threads."""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._values = {}
+        self._counts = {}
+        # Use count -> keys with that count, least recently used first
+        self._by_count = defaultdict(OrderedDict)
+        self._min_count = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._values)
+    
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._values:
+                return default
+            self._touch(key)
+            return self._values[key]
+    
+    def put(self, key, value):
+        with self._lock:
+            if key in self._values:
+                self._values[key] = value
+                self._touch(key)
+                return
+            if len(self._values) >= self.maxsize:
+                coldest = self._by_count[self._min_count]
+                evicted, _ = coldest.popitem(last=False)
+                if not coldest:
+                    del self._by_count[self._min_count]
+                del self._values[evicted], self._counts[evicted]
+            self._values[key] = value
+            self._counts[key] = 1
+            self._by_count[1][key] = None
+            self._min_count = 1
+    
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._counts.clear()
+            self._by_count.clear()
+            self._min_count = 0
+    
+    def _touch(self, key):
+        count = self._counts[key]
+        keys = self._by_count[count]
+        del keys[key]
+        if not keys:
+            del self._by_count[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+        self._counts[key] = count + 1
+        self._by_count[count + 1][key] = None
+
+def _cached_route(search):
+    """Serve a ShortestPath search(start, end) from the instance's route
+    cache, keyed by the search and the (start, end) pair"""
+    name = search.__name__
+    
+    @wraps(search)
+    def cached(self, start, end):
+        if self._routes_version != self.graph.version:
+            # The graph was edited, so every cached route may be wrong
+            self._routes.clear()
+            self._routes_version = self.graph.version
+        key = (name, start, end)
+        hit = self._routes.get(key)
+        if hit is None:
+            path, cost = search(self, start, end)
+            hit = (tuple(path), cost)
+            self._routes.put(key, hit)
+        return list(hit[0]), hit[1]
+    return cached
 
 class ShortestPath:
+    ROUTE_CACHE_SIZE = 4096
+    
     def __init__(self, graph):
         self.graph = graph
+        self._built_for = None
+        self._lists = None
+        # Recurring (start, end) queries are answered from here
+        self._routes = LFUCache(self.ROUTE_CACHE_SIZE)
+        self._routes_version = graph.version
+        # Work done by the searches so far (cache hits add nothing):
+        # nodes settled and relaxations that improved a distance
+        self.stats = {'settled': 0, 'relaxed': 0}
+        self._stats_lock = threading.Lock()
+        # (graph version, a_star, dijkstra) kernels from specialize()
+        self._fixed = None
+    
+    def specialize(self):
+        """Compile a_star and dijkstra kernels with the graph's current CSR
+        arrays baked in (_astar_nb.fixed_topology). They answer searches
+        until the graph is next edited, then the generic kernels take over
+        again. Does nothing without numba."""
+        graph = self.graph
+        if fixed_topology is None or not graph.node_ids:
+            return
+        if not graph.finalized:
+            graph.finalize()
+        a_star, dijkstra = fixed_topology(*graph.to_csr())
+        # Compile now rather than on the first request
+        counts = np.zeros(2, np.int64)
+        a_star(0, 0, self.heuristic_to_all(0), counts)
+        dijkstra(0, 0, counts)
+        self._fixed = (graph.version, a_star, dijkstra)
+    
+    def _fixed_kernels(self):
+        """specialize()'s (a_star, dijkstra) if still valid for the graph"""
+        fixed = self._fixed
+        if fixed is not None and fixed[0] == self.graph.version:
+            return fixed[1:]
+        return None
+    
+    def reset_stats(self):
+        self.stats = {'settled': 0, 'relaxed': 0}
+    
+    def _count(self, settled, relaxed):
+        with self._stats_lock:  # searches may run on several threads
+            stats = self.stats
+            stats['settled'] += settled
+            stats['relaxed'] += relaxed
+    
+    def _sync(self):
+        """Drop per-graph caches once finalize() has built new CSR arrays"""
+        if self._built_for is not self.graph.indptr:
+            self._heuristic_cache.cache_clear()
+            self._lists = None
+            self._built_for = self.graph.indptr
+    
+    def _csr_lists(self):
+        """The CSR arrays as Python lists, which the pure-Python searches
+        index much faster than NumPy arrays (travel times are ints when
+        the graph stores them quantized)"""
+        self._sync()
+        if self._lists is None:
+            graph = self.graph
+            self._lists = (graph.indptr.tolist(), graph.indices.tolist(), graph.weights.tolist())
+        return self._lists
+    
+    def _known(self, *node_ids):
+        """Finalize the graph if it changed (every search runs on the CSR
+        arrays) and tell whether all node_ids are in it"""
+        graph = self.graph
+        if not graph.finalized:
+            graph.finalize()
+        return all(node_id in graph.node_index for node_id in node_ids)
     
+    @staticmethod
+    def _no_route(start, end):
+        """Result for a start or end that isn't in the graph"""
+        return [start], 0 if start == end else float('inf')
+    
+    @_cached_route
     def dijkstra(self, start, end):
-        pq = [(0, start)]
-        distances = {start: 0}
-        previous = {}
+        graph = self.graph
+        if not self._known(start, end):
+            return self._no_route(start, end)
+        if dijkstra_csr is None:
+            return self._search(start, end)
+        
+        src, dst = graph.node_index[start], graph.node_index[end]
+        # Per call, so concurrent threads never add to the same counters
+        counts = np.zeros(2, np.int64)
+        fixed = self._fixed_kernels()
+        if fixed is not None:
+            path, cost = fixed[1](src, dst, counts)
+        elif graph.weights.dtype == np.uint16:
+            path, cost = dial_csr(*graph.to_csr(), src, dst, np.zeros(len(graph.node_ids)), counts)
+        else:
+            path, cost = dijkstra_csr(*graph.to_csr(), src, dst, counts)
+        self._count(*counts.tolist())
+        return self._kernel_result(start, path, cost)
+    
+    def _kernel_result(self, start, path, cost):
+        """(node ids, cost) from a numba search's (index path, cost)"""
+        if len(path) == 0:
+            return [start], float('inf')
+        node_ids = self.graph.node_ids
+        return [node_ids[i] for i in path.tolist()], float(cost)
+    
+    def dijkstra_all(self, start):
+        """Dijkstra from start over the whole graph. Returns (dist, prev)
+        as arrays indexed like the CSR arrays: the travel time to every
+        node and its predecessor on a shortest path (-1 if none). A start
+        that isn't in the graph reaches nothing: all inf and -1."""
+        graph = self.graph
+        if not self._known(start):
+            n = len(graph.node_ids)
+            return np.full(n, np.inf, np.float32), np.full(n, -1, np.int32)
+        src = graph.node_index[start]
+        if dijkstra_all_csr is not None:
+            counts = np.zeros(2, np.int64)
+            dist, prev = dijkstra_all_csr(*graph.to_csr(), src, counts)
+            self._count(*counts.tolist())
+            return dist, prev
+        dist, prev = csgraph_dijkstra(graph.csgraph, indices=src, return_predecessors=True)
+        # scipy doesn't report relaxations, but a full sweep settles
+        # every reachable node
+        self._count(int(np.isfinite(dist).sum()), 0)
+        return dist, np.where(prev < 0, -1, prev)
+    
+    def paths_from(self, start, ends):
+        """Shortest (path, travel time) from start to each of ends, all read
+        off a single dijkstra_all instead of one search per end"""
+        graph = self.graph
+        if not self._known(start, *ends):
+            return [self.a_star(start, end) for end in ends]
+        
+        dist, prev = self.dijkstra_all(start)
+        src = graph.node_index[start]
+        node_ids = graph.node_ids
+        if reconstruct_path is not None:
+            buf = np.empty(len(node_ids), np.int32)
+            prev = prev.astype(np.int32, copy=False)
+        else:
+            prev = prev.tolist()
+        dist = dist.tolist()
+        results = []
+        for end in ends:
+            dst = graph.node_index[end]
+            if dist[dst] == float('inf'):
+                results.append(([start], float('inf')))
+                continue
+            if reconstruct_path is not None:
+                path = buf[reconstruct_path(prev, src, dst, buf):].tolist()
+            else:
+                path = [dst]
+                while path[-1] != src:
+                    path.append(prev[path[-1]])
+                path.reverse()
+            results.append(([node_ids[i] for i in path], float(dist[dst])))
+        return results
+    
+    def heuristic_to_all(self, goal_idx):
+        """Admissible travel-time lower bound from every node to the goal,
+        as an array indexed like the CSR arrays (one vectorized pass).
+        Takes the larger of the straight-line and landmark (ALT) bounds.
+        Arrays for recent goals are cached and returned read-only."""
+        self._sync()
+        return self._heuristic_cache(goal_idx)
+    
+    @cached_property
+    def _heuristic_cache(self):
+        return lru_cache(maxsize=32)(self._heuristic_to_all_impl)
+    
+    def _heuristic_to_all_impl(self, goal_idx):
+        graph = self.graph
+        if gc_dist_many is not None:
+            km = gc_dist_many(graph.lats[goal_idx], graph.lons[goal_idx],
+                              graph.lats, graph.lons, np.empty(len(graph.lats)))
+        else:
+            km = haversine_km(graph.lats, graph.lons, graph.lats[goal_idx], graph.lons[goal_idx])
+        straight = graph.time_per_km * km
+        landmark = alt_h(np.arange(len(graph.node_ids)), goal_idx, graph.landmark_dist)
+        h_all = np.maximum(straight, landmark)
+        h_all.flags.writeable = False
+        return h_all
+    
+    @_cached_route
+    def a_star(self, start, end):
+        graph = self.graph
+        if not self._known(start, end):
+            return self._no_route(start, end)
+        
+        h_all = self.heuristic_to_all(graph.node_index[end])
+        if astar_csr is None:
+            if graph.int_weights:
+                return self._a_star_buckets(start, end, h_all)
+            return self._search(start, end, h_all)
+        
+        src, dst = graph.node_index[start], graph.node_index[end]
+        counts = np.zeros(2, np.int64)
+        fixed = self._fixed_kernels()
+        if fixed is not None:
+            path, cost = fixed[0](src, dst, h_all, counts)
+        else:
+            # Whole-number weights can skip the heap for Dial's buckets
+            search = dial_csr if graph.weights.dtype == np.uint16 else astar_csr
+            path, cost = search(*graph.to_csr(), src, dst, h_all, counts)
+        self._count(*counts.tolist())
+        return self._kernel_result(start, path, cost)
+    
+    def _search(self, start, end, h_all=None):
+        """Pure-Python A* (Dijkstra if h_all is None), picking the
+        relaxation that suits the graph's density"""
+        graph = self.graph
+        if len(graph.indices) >= VECTOR_MIN_DEGREE * len(graph.node_ids):
+            return self._search_np(start, end, h_all)
+        return self._search_idx(start, end, None if h_all is None else h_all.tolist())
+    
+    def _search_np(self, start, end, h=None):
+        """_search_idx with each node's edges relaxed in one NumPy
+        expression against the distance array; only the heap pushes stay
+        per edge"""
+        graph = self.graph
+        src, dst = graph.node_index[start], graph.node_index[end]
+        _, indices, weights = graph.to_csr()
+        indptr = self._csr_lists()[0]  # ints slice faster than NumPy scalars
+        n = len(indptr) - 1
+        if h is None:
+            h = np.zeros(n)
+        
+        dist = np.full(n, np.inf)
+        previous = np.full(n, -1, np.int32)
+        visited = np.zeros(n, np.bool_)
+        dist[src] = 0.0
+        pq = [(float(h[src]), 0.0, src)]
+        relaxed = 0
         
         while pq:
-            current_dist, current = heapq.heappop(pq)
+            _, current_dist, current = heapq.heappop(pq)
+            
+            if current == dst:
+                break
             
-            if current == end:
+            if visited[current]:
+                continue
+            visited[current] = True
+            
+            lo, hi = indptr[current], indptr[current + 1]
+            neighbors = indices[lo:hi]
+            new_dist = np.add(current_dist, weights[lo:hi], dtype=np.float64)
+            better = new_dist < dist[neighbors]
+            if not better.any():
+                continue
+            
+            neighbors, new_dist = neighbors[better], new_dist[better]
+            relaxed += len(neighbors)
+            # minimum.at, as parallel roads repeat a neighbour in one slice
+            np.minimum.at(dist, neighbors, new_dist)
+            previous[neighbors] = current
+            for key, g, neighbor in zip((new_dist + h[neighbors]).tolist(),
+                                        new_dist.tolist(), neighbors.tolist()):
+                heapq.heappush(pq, (key, g, neighbor))
+        
+        # Settled: every closed node, plus dst, popped but never closed
+        self._count(int(visited.sum()) + int(dist[dst] != np.inf), relaxed)
+        if dist[dst] == np.inf:
+            return [start], float('inf')
+        previous = previous.tolist()
+        path = [dst]
+        while path[-1] != src:
+            path.append(previous[path[-1]])
+        node_ids = graph.node_ids
+        return [node_ids[i] for i in reversed(path)], float(dist[dst])
+    
+    def _search_idx(self, start, end, h=None):
+        """A* over CSR indices (Dijkstra if h is None), keeping distances
+        and predecessors in preallocated lists instead of dicts"""
+        graph = self.graph
+        src, dst = graph.node_index[start], graph.node_index[end]
+        indptr, indices, weights = self._csr_lists()
+        n = len(indptr) - 1
+        if h is None:
+            h = [0.0] * n
+        
+        inf = float('inf')
+        dist = [inf] * n
+        previous = [-1] * n
+        # Settled nodes; with a consistent h each is final once popped, so
+        # stale heap entries and edges back into the settled set are skipped
+        visited = bytearray(n)
+        dist[src] = 0.0
+        pq = []
+        # The smallest entry pushed while expanding the last node is held
+        # back: it is often the next one popped, and heappushpop then hands
+        # it straight back instead of a push and a pop each sifting the heap
+        held = (h[src], 0.0, src)
+        relaxed = 0
+        
+        while held is not None or pq:
+            if held is not None:
+                _, current_dist, current = heapq.heappushpop(pq, held)
+                held = None
+            else:
+                _, current_dist, current = heapq.heappop(pq)
+            
+            if current == dst:
                 break
             
-            if current_dist > distances.get(current, float('inf')):
+            if visited[current]:
                 continue
+            visited[current] = 1
             
-            for neighbor, travel_time in self.graph.get_neighbors(current):
-                new_dist = current_dist + travel_time
+            for k in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[k]
+                if visited[neighbor]:
+                    continue
+                new_dist = current_dist + weights[k]
                 
-                if new_dist < distances.get(neighbor, float('inf')):
-                    distances[neighbor] = new_dist
+                if new_dist < dist[neighbor]:
+                    relaxed += 1
+                    dist[neighbor] = new_dist
                     previous[neighbor] = current
-                    heapq.heappush(pq, (new_dist, neighbor))
-        
-        path = []
-        current = end
-        while current in previous:
-            path.append(current)
-            current = previous[current]
-        path.append(start)
+                    entry = (new_dist + h[neighbor], new_dist, neighbor)
+                    if held is None:
+                        held = entry
+                    elif entry < held:
+                        heapq.heappush(pq, held)
+                        held = entry
+                    else:
+                        heapq.heappush(pq, entry)
         
-        return list(reversed(path)), distances.get(end, float('inf'))
+        self._count(visited.count(1) + (dist[dst] != inf), relaxed)
+        if dist[dst] == inf:
+            return [start], inf
+        path = [dst]
+        while path[-1] != src:
+            path.append(previous[path[-1]])
+        node_ids = graph.node_ids
+        return [node_ids[i] for i in reversed(path)], float(dist[dst])
     
-    def a_star(self, start, end):
-        g_score = {start: 0}
-        f_score = {start: 0}
+    def _a_star_buckets(self, start, end, h_all):
+        """A* on Dial's bucket queue, for graphs whose travel times are all
+        whole numbers. Flooring the heuristic keeps it consistent there, so
+        every key g + h is an exact int and buckets replace the heap."""
+        graph = self.graph
+        src, dst = graph.node_index[start], graph.node_index[end]
+        h = [int(x) if x != float('inf') else None for x in np.floor(h_all).tolist()]
+        if h[src] is None:  # end is in another component
+            return [start], float('inf')
         
-        pq = [(f_score[start], 0, start)]
-        previous = {}
+        indptr, indices, weights = self._csr_lists()
+        inf = float('inf')
+        g = [inf] * len(h)
+        g[src] = 0
+        previous = [-1] * len(h)
+        closed = bytearray(len(h))
+        buckets = [[] for _ in range(h[src] + 1)]
+        buckets[h[src]].append(src)
+        cursor = h[src]
+        relaxed = 0
         
-        while pq:
-            current_f, current_g, current = heapq.heappop(pq)
+        while cursor < len(buckets):
+            if not buckets[cursor]:
+                cursor += 1
+                continue
+            current = buckets[cursor].pop()
+            if closed[current] or g[current] + h[current] != cursor:
+                continue  # stale entry
+            if current == dst:
+                break
+            closed[current] = 1
             
-            if current == end:
+            for k in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[k]
+                if closed[neighbor]:
+                    continue
+                tentative_g = g[current] + int(weights[k])
+                if h[neighbor] is None or tentative_g >= g[neighbor]:
+                    continue
+                relaxed += 1
+                g[neighbor] = tentative_g
+                previous[neighbor] = current
+                key = tentative_g + h[neighbor]
+                if key >= len(buckets):
+                    buckets.extend([] for _ in range(key + 1 - len(buckets)))
+                buckets[key].append(neighbor)
+        
+        self._count(closed.count(1) + (g[dst] != inf), relaxed)
+        if g[dst] == inf:
+            return [start], inf
+        path = [dst]
+        while path[-1] != src:
+            path.append(previous[path[-1]])
+        node_ids = graph.node_ids
+        return [node_ids[i] for i in reversed(path)], float(g[dst])
+    
+    @_cached_route
+    def bidir_a_star(self, src, dst):
+        """A* from both ends at once, meeting in the middle.
+        
+        Uses the averaged potential p(u) = (h_dst(u) - h_src(u)) / 2 forward
+        and -p(u) backward, which keeps both searches consistent so the
+        search can stop once top_f + top_b >= best meeting cost."""
+        if src == dst:
+            return [src], 0
+        
+        graph = self.graph
+        if not self._known(src, dst):
+            return self._no_route(src, dst)
+        h_dst = self.heuristic_to_all(graph.node_index[dst])
+        h_src = self.heuristic_to_all(graph.node_index[src])
+        with np.errstate(invalid='ignore'):  # inf - inf only off the search's component
+            potential = ((h_dst - h_src) / 2).tolist()
+        return self._bidirectional(src, dst, potential)
+    
+    @_cached_route
+    def bidirectional_dijkstra(self, start, end):
+        """Dijkstra from both ends at once, meeting in the middle. Each
+        search covers a ball of about half the radius of plain dijkstra's."""
+        if start == end:
+            return [start], 0
+        if not self._known(start, end):
+            return self._no_route(start, end)
+        return self._bidirectional(start, end)
+    
+    def _bidirectional(self, start, end, potential=None):
+        """Shared search of bidir_a_star (averaged ALT potentials) and
+        bidirectional_dijkstra (no potential: every key is a distance), over
+        CSR indices with per-side distances in preallocated lists.
+        potential is a list indexed like the CSR arrays."""
+        graph = self.graph
+        src, dst = graph.node_index[start], graph.node_index[end]
+        indptr, indices, weights = self._csr_lists()
+        n = len(indptr) - 1
+        if potential is None:
+            potential = [0.0] * n
+        
+        inf = float('inf')
+        sign = (1, -1)
+        g = ([inf] * n, [inf] * n)
+        g[0][src] = g[1][dst] = 0.0
+        previous = ([-1] * n, [-1] * n)
+        closed = (bytearray(n), bytearray(n))
+        # Entries carry g so a stale one is spotted without a lookup
+        pq = ([(potential[src], 0.0, src)], [(-potential[dst], 0.0, dst)])
+        best = inf
+        meet = -1
+        relaxed = 0
+        
+        while pq[0] and pq[1]:
+            if pq[0][0][0] + pq[1][0][0] >= best:
                 break
             
-            if current_g > g_score.get(current, float('inf')):
+            if len(pq[0]) != len(pq[1]):
+                side = 0 if len(pq[0]) < len(pq[1]) else 1
+            else:
+                side = 0 if pq[0][0][0] <= pq[1][0][0] else 1
+            _, current_g, current = heapq.heappop(pq[side])
+            closed_this = closed[side]
+            if closed_this[current]:
                 continue
+            closed_this[current] = 1
             
-            for neighbor, travel_time in self.graph.get_neighbors(current):
-                tentative_g = current_g + travel_time
+            g_this, g_other = g[side], g[1 - side]
+            prev_this, pq_this, s = previous[side], pq[side], sign[side]
+            for k in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[k]
+                tentative_g = current_g + weights[k]
                 
-                if tentative_g < g_score.get(neighbor, float('inf')):
-                    previous[neighbor] = current
-                    g_score[neighbor] = tentative_g
-                    f_score[neighbor] = tentative_g
-                    heapq.heappush(pq, (f_score[neighbor], tentative_g, neighbor))
-        
-        path = []
-        current = end
-        while current in previous:
-            path.append(current)
-            current = previous[current]
-        path.append(start)
-        
-        return list(reversed(path)), g_score.get(end, float('inf'))
\ No newline at end of file
+                if tentative_g + g_other[neighbor] < best:
+                    best = tentative_g + g_other[neighbor]
+                    meet = neighbor
+                
+                if not closed_this[neighbor] and tentative_g < g_this[neighbor]:
+                    relaxed += 1
+                    g_this[neighbor] = tentative_g
+                    prev_this[neighbor] = current
+                    heapq.heappush(pq_this, (tentative_g + s * potential[neighbor],
+                                             tentative_g, neighbor))
+        
+        self._count(closed[0].count(1) + closed[1].count(1), relaxed)
+        if meet == -1:
+            return [start], inf
+        
+        path = [meet]
+        while previous[0][path[-1]] != -1:
+            path.append(previous[0][path[-1]])
+        path.reverse()
+        while previous[1][path[-1]] != -1:
+            path.append(previous[1][path[-1]])
+        node_ids = graph.node_ids
+        return [node_ids[i] for i in path], float(best)
+    
+    def nearest_of(self, source, targets):
+        """Closest of `targets` to `source` and its travel time, found with a
+        single Dijkstra expansion instead of one search per target"""
+        if not self._known(source):
+            return (source, 0) if source in targets else (None, float('inf'))
+        graph = self.graph
+        index = graph.node_index
+        remaining = {index[t] for t in targets if t in index}
+        indptr, indices, weights = self._csr_lists()
+        
+        inf = float('inf')
+        distances = [inf] * (len(indptr) - 1)
+        src = index[source]
+        distances[src] = 0.0
+        pq = [(0.0, src)]
+        settled = relaxed = 0
+        
+        while pq and remaining:
+            current_dist, current = heapq.heappop(pq)
+            
+            if current_dist > distances[current]:
+                continue
+            settled += 1
+            
+            # Nodes are popped in non-decreasing distance order, so the
+            # first target settled is the nearest one
+            if current in remaining:
+                self._count(settled, relaxed)
+                return graph.node_ids[current], float(current_dist)
+            
+            for k in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[k]
+                new_dist = current_dist + weights[k]
+                
+                if new_dist < distances[neighbor]:
+                    relaxed += 1
+                    distances[neighbor] = new_dist
+                    heapq.heappush(pq, (new_dist, neighbor))
+        
+        self._count(settled, relaxed)
+        return None, float('inf')
\ No newline at end of file
@@ -3,40 +3,65 @@ Simple tests for the transport system
 """
 
 import time
+from multiprocessing import shared_memory
 from main import create_kampala_graph
+from graph import SimpleGraph
 from shortest_path import ShortestPath
+import parallel
 from parallel import ParallelProcessor
+from heuristics import MultiStopRouter
+
+def make_grid_graph(side):
+    """side x side street grid with roads of varying travel time"""
+    graph = SimpleGraph()
+    for i in range(side * side):
+        graph.add_node(i, 0.30 + (i // side) * 0.002, 32.55 + (i % side) * 0.002)
+    for i in range(side * side):
+        if i % side + 1 < side:
+            graph.add_edge(i, i + 1, 1 + (i * 7) % 5)
+        if i + side < side * side:
+            graph.add_edge(i, i + side, 1 + (i * 3) % 5)
+    graph.finalize()
+    return graph
 
 def test_performance():
     """Test the performance of different algorithms"""
     graph, _ = create_kampala_graph()
     
-    # Test Dijkstra vs A*
-    sp = ShortestPath(graph)
-    
-    start_time = time.time()
-    for _ in range(100):
-        sp.dijkstra(0, 6)
-    dijkstra_time = time.time() - start_time
-    
-    start_time = time.time()
-    for _ in range(100):
-        sp.a_star(0, 6)
-    astar_time = time.time() - start_time
-    
-    print(f"Dijkstra 100 runs: {dijkstra_time:.3f}s")
-    print(f"A* 100 runs: {astar_time:.3f}s")
-    print(f"A* is {dijkstra_time/astar_time:.1f}x faster")
+    # Every search on the same pairs of each graph. No pair repeats for a
+    # method, so nothing is served from the route cache, and the settled
+    # node count (the work each search does) is printed with the time.
+    grid = make_grid_graph(30)
+    scenarios = [
+        ("Kampala", graph, [(a, b) for a in range(15) for b in range(15) if a != b]),
+        ("Grid 30x30", grid, [(i, 899 - (i * 37) % 900) for i in range(0, 900, 30)]),
+    ]
+    for name, g, pairs in scenarios:
+        print(f"\n{name}, {len(pairs)} routes:")
+        counts = {}
+        for method in ("dijkstra", "a_star", "bidirectional_dijkstra", "bidir_a_star"):
+            sp = ShortestPath(g)
+            search = getattr(sp, method)
+            start_time = time.time()
+            for a, b in pairs:
+                search(a, b)
+            elapsed = time.time() - start_time
+            counts[method] = sp.stats["settled"]
+            print(f"  {method:24s} {elapsed:.3f}s  settled {sp.stats['settled']:6d}"
+                  f"  relaxed {sp.stats['relaxed']:6d}")
+        # Goal direction and meeting in the middle both cut the work
+        assert counts["a_star"] <= counts["dijkstra"], counts
+        assert counts["bidirectional_dijkstra"] <= counts["dijkstra"], counts
     
     # Test parallel speedup
     print("\nTesting parallel speedup:")
-    pp = ParallelProcessor(num_workers=4)
+    pp = ParallelProcessor(graph, num_workers=4)
     
     # Create many requests
     requests = [(i % 8, (i + 3) % 8) for i in range(20)]
     
     start_time = time.time()
-    results = pp.simple_parallel(graph, requests)
+    results = pp.simple_parallel(requests)
     parallel_time = time.time() - start_time
     
     print(f"Parallel processing: {parallel_time:.3f}s for 20 requests")
@@ -62,7 +87,159 @@ def test_correctness():
     
     print("All correctness tests passed!")
 
+def test_astar_matches_dijkstra():
+    """Test that the A* variants find optimal routes between every pair of locations"""
+    graph, locations = create_kampala_graph()
+    sp = ShortestPath(graph)
+    
+    for start in range(len(locations)):
+        for end in range(len(locations)):
+            _, expected = sp.dijkstra(start, end)
+            path, dist = sp.a_star(start, end)
+            assert abs(dist - expected) < 1e-6, f"A* {start}->{end}: {dist} != {expected}"
+            assert path[0] == start and path[-1] == end, f"Bad A* path {path}"
+            path, dist = sp.bidir_a_star(start, end)
+            assert abs(dist - expected) < 1e-6, f"Bidirectional A* {start}->{end}: {dist} != {expected}"
+            assert path[0] == start and path[-1] == end, f"Bad bidirectional A* path {path}"
+            path, dist = sp.bidirectional_dijkstra(start, end)
+            assert abs(dist - expected) < 1e-6, f"Bidirectional Dijkstra {start}->{end}: {dist} != {expected}"
+            assert path[0] == start and path[-1] == end, f"Bad bidirectional Dijkstra path {path}"
+    
+    ends = list(range(len(locations)))
+    for start in range(len(locations)):
+        for end, (path, dist) in zip(ends, sp.paths_from(start, ends)):
+            _, expected = sp.dijkstra(start, end)
+            assert abs(dist - expected) < 1e-6, f"One-to-many {start}->{end}: {dist} != {expected}"
+            assert path[0] == start and path[-1] == end, f"Bad one-to-many path {path}"
+    
+    dist, prev = sp.dijkstra_all(99)
+    assert (dist == float('inf')).all() and (prev == -1).all(), "Unknown start should reach nothing"
+    
+    print("A* optimality tests passed!")
+
+def test_parallel_roads():
+    """Test that the fastest of two parallel roads is used everywhere"""
+    graph = SimpleGraph()
+    graph.add_node(0, 0.3146, 32.5761)
+    graph.add_node(1, 0.3191, 32.5836)
+    graph.add_node(2, 0.3175, 32.5800)
+    graph.add_edge(0, 1, 9)
+    graph.add_edge(0, 1, 4)
+    graph.add_edge(1, 2, 3)
+    graph.finalize()
+    
+    sp = ShortestPath(graph)
+    assert sp.a_star(0, 2)[1] == 7, "A* should take the faster road"
+    assert MultiStopRouter(graph).greedy_tsp([0, 2])[1] == 7, "Tour should take the faster road"
+    
+    print("Parallel road tests passed!")
+
+def test_route_cache():
+    """Test that cached routes are dropped once the graph is edited"""
+    graph = SimpleGraph()
+    graph.add_node(0, 0.3146, 32.5761)
+    graph.add_node(1, 0.3191, 32.5836)
+    graph.add_edge(0, 1, 9)
+    graph.finalize()
+    
+    sp = ShortestPath(graph)
+    assert sp.a_star(0, 1)[1] == 9
+    assert sp.a_star(0, 1)[1] == 9, "Cached route should match the search"
+    graph.add_edge(0, 1, 4)
+    graph.finalize()
+    assert sp.a_star(0, 1)[1] == 4, "Stale route served after the graph changed"
+    
+    print("Route cache tests passed!")
+
+def test_tour_cache():
+    """Test that cached tours are dropped once the graph is edited"""
+    graph, _ = create_kampala_graph()
+    msr = MultiStopRouter(graph)
+    stops = [0, 8, 14]
+    
+    before = msr.greedy_tsp(stops)
+    graph.add_edge(0, 8, 1)
+    graph.finalize()
+    after = msr.greedy_tsp(stops)
+    assert after == MultiStopRouter(graph).greedy_tsp(stops), "Stale tour served after the graph changed"
+    assert after[1] < before[1], "The new road should shorten the tour"
+    
+    print("Tour cache tests passed!")
+
+def test_specialized():
+    """Test that specialize()'s kernels agree with the generic searches
+    and are dropped once the graph is edited"""
+    graph, _ = create_kampala_graph()
+    sp = ShortestPath(graph)
+    fixed = ShortestPath(graph)
+    fixed.specialize()
+    
+    for start in range(15):
+        for end in range(15):
+            assert fixed.a_star(start, end) == sp.a_star(start, end)
+            assert fixed.dijkstra(start, end) == sp.dijkstra(start, end)
+    
+    graph.add_edge(0, 14, 1)
+    graph.finalize()
+    assert fixed.a_star(0, 14) == ([0, 14], 1), "Specialized kernel used on an edited graph"
+    
+    print("Specialized kernel tests passed!")
+
+def test_parallel_processes():
+    """Test the process-pool path of ParallelProcessor (taken without numba)
+    and that close() leaves no shared memory behind"""
+    graph, _ = create_kampala_graph()
+    sp = ShortestPath(graph)
+    requests = [(start, (start * 7 + 3) % 15) for start in range(15)] + [(0, 8), (0, 14)]
+    
+    threaded = parallel.astar_csr
+    parallel.astar_csr = None  # as if numba were missing
+    try:
+        pp = ParallelProcessor(graph, num_workers=2)
+        pp.share()
+        block_names = [spec[1] for spec in pp._shared[2]]
+        for _ in range(2):  # the second batch reuses the pool
+            for (start, end), (path, time) in zip(requests, pp.simple_parallel(requests)):
+                assert path[0] == start and path[-1] == end, f"Bad path {path}"
+                assert abs(time - sp.dijkstra(start, end)[1]) < 1e-6, f"Wrong time to {end}"
+        pp.close()
+    finally:
+        parallel.astar_csr = threaded
+    
+    for name in block_names:
+        try:
+            shared_memory.SharedMemory(name=name).close()
+        except FileNotFoundError:
+            continue
+        raise AssertionError(f"Shared memory block {name} left after close()")
+    
+    print("Process pool tests passed!")
+
+def test_multi_stop():
+    """Test that the greedy tour visits every stop once"""
+    graph, _ = create_kampala_graph()
+    sp = ShortestPath(graph)
+    msr = MultiStopRouter(graph)
+    
+    stops = [0, 6, 8, 14, 4]
+    route, total = msr.greedy_tsp(stops)
+    
+    assert route[0] == stops[0], "Tour should start at the first stop"
+    assert sorted(route) == sorted(stops), f"Tour should visit every stop: {route}"
+    
+    legs = sum(sp.dijkstra(a, b)[1] for a, b in zip(route, route[1:]))
+    assert abs(total - legs) < 1e-6, f"Tour time {total} != sum of legs {legs}"
+    
+    print("Multi-stop tests passed!")
+
 if __name__ == "__main__":
     print("Running tests...")
     test_correctness()
+    test_astar_matches_dijkstra()
+    test_parallel_roads()
+    test_route_cache()
+    test_tour_cache()
+    test_specialized()
+    test_parallel_processes()
+    test_multi_stop()
     test_performance()
\ No newline at end of file